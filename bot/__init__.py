@@ -11,6 +11,15 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+# uvloop's policy must be set before pyrogram's Client grabs the event loop
+# (uvloop.install() is deprecated on Python 3.12)
+try:
+    import asyncio
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 from config import Config
 
 bot = Config.BOT_USERNAME
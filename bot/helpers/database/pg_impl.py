@@ -1,5 +1,6 @@
 import psycopg2
 import datetime
+import threading
 import psycopg2.extras
 from .pg_db import DataBaseHandle
 from config import Config
@@ -134,6 +135,76 @@ class DownloadHistory(DataBaseHandle):
         self.ccur(cur)
         return results
 
+class FileCache(DataBaseHandle):
+    """
+    Telegram file_id of already uploaded files, keyed by content digest
+    Called from executor threads - each method holds the lock for its whole transaction
+    """
+    MAX_ENTRIES = 5000
+    # entries are trimmed back to MAX_ENTRIES at startup and every TRIM_EVERY inserts
+    TRIM_EVERY = 100
+    # least recently used entries beyond MAX_ENTRIES are dropped
+    TRIM_SQL = """
+    DELETE FROM file_cache WHERE digest IN (
+        SELECT digest FROM file_cache ORDER BY last_used DESC OFFSET %s
+    )
+    """
+
+    def __init__(self, dburl=None):
+        if dburl is None:
+            dburl = Config.DATABASE_URL
+        super().__init__(dburl)
+
+        schema = """
+        CREATE TABLE IF NOT EXISTS file_cache (
+            digest VARCHAR(64) PRIMARY KEY,
+            ftype VARCHAR(10) NOT NULL,
+            file_id VARCHAR(255) NOT NULL,
+            last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_file_cache_used ON file_cache(last_used);
+        """
+        self._lock = threading.Lock()
+        self._inserts = 0
+        cur = self.scur()
+        cur.execute(schema)
+        cur.execute(self.TRIM_SQL, (self.MAX_ENTRIES,))
+        self._conn.commit()
+        self.ccur(cur)
+
+    def get_file_id(self, digest):
+        sql = "UPDATE file_cache SET last_used = CURRENT_TIMESTAMP WHERE digest = %s RETURNING file_id"
+        with self._lock:
+            cur = self.scur()
+            cur.execute(sql, (digest,))
+            row = cur.fetchone()
+            self._conn.commit()
+            self.ccur(cur)
+        return row[0] if row else None
+
+    def set_file_id(self, digest, ftype, file_id):
+        sql = """
+        INSERT INTO file_cache (digest, ftype, file_id) VALUES (%s, %s, %s)
+        ON CONFLICT (digest) DO UPDATE SET file_id = EXCLUDED.file_id, last_used = CURRENT_TIMESTAMP
+        """
+        with self._lock:
+            cur = self.scur()
+            cur.execute(sql, (digest, ftype, file_id))
+            # the trim sorts the whole table, so only run it now and then
+            self._inserts += 1
+            if self._inserts % self.TRIM_EVERY == 0:
+                cur.execute(self.TRIM_SQL, (self.MAX_ENTRIES,))
+            self._conn.commit()
+            self.ccur(cur)
+
+    def remove_file_id(self, digest):
+        with self._lock:
+            cur = self.scur()
+            cur.execute("DELETE FROM file_cache WHERE digest = %s", (digest,))
+            self._conn.commit()
+            self.ccur(cur)
+
 # Initialize database handlers
 set_db = BotSettings()
 download_history = DownloadHistory()
+file_cache = FileCache()
@@ -5,6 +5,7 @@ import re
 from pyrogram.types import Message
 from pyrogram.errors import MessageNotModified, FloodWait
 
+from config import Config
 from bot.tgclient import aio
 from bot.settings import bot_set
 from bot.logger import LOGGER
@@ -26,6 +27,107 @@ user_details = {
 }
 
 
+class UploadAdmission:
+    """
+    Caps concurrent Telegram uploads with a counter guarded by an asyncio.Condition.
+    Unlike asyncio.Semaphore the limit can be resized safely while tasks wait:
+    it is halved on FloodWait and grows back one slot per GROW_AFTER successful sends.
+    """
+    GROW_AFTER = 10
+
+    def __init__(self, limit: int):
+        self.max_limit = max(1, limit)
+        self.limit = self.max_limit
+        self.active = 0
+        self.success_streak = 0
+        self.cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.cond:
+            while self.active >= self.limit:
+                await self.cond.wait()
+            self.active += 1
+
+    async def release(self):
+        async with self.cond:
+            self.active -= 1
+            self.cond.notify(1)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.release()
+
+    async def shrink(self):
+        async with self.cond:
+            self.limit = max(1, self.limit // 2)
+            self.success_streak = 0
+
+    async def record_success(self):
+        if self.limit >= self.max_limit:
+            return
+        async with self.cond:
+            self.success_streak += 1
+            if self.success_streak >= self.GROW_AFTER:
+                self.limit = min(self.max_limit, self.limit + 1)
+                self.success_streak = 0
+                self.cond.notify_all()
+
+
+# One admission for the whole bot: CONCURRENT_UPLOADS caps sends across all tasks and users
+upload_admission = UploadAdmission(Config.CONCURRENT_UPLOADS)
+
+
+class EditPacer:
+    """
+    Spaces message edits from every task by at least `interval` seconds, in call order.
+    Edits to the same message coalesce while one is waiting for its slot: the queued call
+    sends the newest text and the superseded callers return at once without taking a slot.
+    A FloodWait pushes the next free slot back so other edits wait it out
+    instead of each running into the same limit.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.next_slot = 0.0
+        # (chat id, message id) -> [text, markup] of the edit waiting for its slot
+        self.pending = {}
+
+    async def claim(self, msg: Message, text, markup):
+        """
+        Queue an edit of msg
+        Returns:
+            [text, markup] to send once the slot is reached (latest queued values),
+            or None when an edit of msg is already waiting and now carries this text
+        """
+        key = (msg.chat.id, msg.id)
+        entry = self.pending.get(key)
+        if entry is not None:
+            entry[:] = (text, markup)
+            return None
+        self.pending[key] = entry = [text, markup]
+        try:
+            await self.wait()
+        finally:
+            del self.pending[key]
+        return entry
+
+    async def wait(self):
+        now = asyncio.get_running_loop().time()
+        # reserve a slot before sleeping - callers queue up behind each other
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def backoff(self, seconds: float):
+        self.next_slot = max(self.next_slot, asyncio.get_running_loop().time() + seconds)
+
+
+edit_pacer = EditPacer(Config.EDIT_MIN_INTERVAL)
+
+
 async def fetch_user_details(msg: Message, reply=False) -> dict:
     details = user_details.copy()
     details['user_id'] = msg.from_user.id
@@ -143,7 +245,9 @@ async def send_message(user, item, itype='text', caption=None, markup=None, chat
                 caption=caption,
                 reply_to_message_id=user['r_id']
             )
+        await upload_admission.record_success()
     except FloodWait as e:
+        await upload_admission.shrink()
         await asyncio.sleep(e.value)
         return await send_message(user, item, itype, caption, markup, chat_id, meta)
     except Exception as e:
@@ -153,6 +257,11 @@ async def send_message(user, item, itype='text', caption=None, markup=None, chat
 
 
 async def edit_message(msg:Message, text, markup=None, antiflood=True):
+    entry = await edit_pacer.claim(msg, text, markup)
+    if entry is None:
+        # superseded - the edit already queued for this message sends our text
+        return None
+    text, markup = entry
     try:
         edited = await msg.edit_text(
             text=text,
@@ -163,6 +272,7 @@ async def edit_message(msg:Message, text, markup=None, antiflood=True):
     except MessageNotModified:
         return None
     except FloodWait as e:
+        edit_pacer.backoff(e.value)
         if antiflood:
             await asyncio.sleep(e.value)
             return await edit_message(msg, text, markup, antiflood)
@@ -0,0 +1,90 @@
+import asyncio
+import aiohttp
+
+from config import Config
+
+from ..logger import LOGGER
+
+# Long lived `rclone rcd` so link lookups are HTTP calls instead of a new rclone process each time
+rcd_process = None
+rc_session = None
+
+
+async def start_rcd():
+    """
+    Starts the rclone remote control daemon if it is not running
+    """
+    global rcd_process
+    if rcd_process and rcd_process.returncode is None:
+        return
+    try:
+        rcd_process = await asyncio.create_subprocess_exec(
+            'rclone', 'rcd',
+            '--rc-no-auth',
+            f'--rc-addr={Config.RCLONE_RC_ADDR}',
+            '--config', './rclone.conf',
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        LOGGER.info(f"RCLONE : Started rcd on {Config.RCLONE_RC_ADDR}")
+    except Exception as e:
+        LOGGER.error(f"RCLONE : Failed to start rcd - {str(e)}")
+
+
+async def stop_rcd():
+    """
+    Closes the HTTP session and stops the rclone daemon
+    """
+    global rcd_process, rc_session
+    if rc_session:
+        await rc_session.close()
+        rc_session = None
+    if rcd_process and rcd_process.returncode is None:
+        rcd_process.terminate()
+        await rcd_process.wait()
+    rcd_process = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    global rc_session
+    if rc_session is None or rc_session.closed:
+        rc_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32)
+        )
+    return rc_session
+
+
+async def public_link(remote: str):
+    """
+    Args:
+        remote: path relative to Config.RCLONE_DEST
+    Returns:
+        str or None: public link for the path
+    """
+    try:
+        async with get_session().post(
+            f"http://{Config.RCLONE_RC_ADDR}/operations/publiclink",
+            json={'fs': Config.RCLONE_DEST, 'remote': remote}
+        ) as response:
+            data = await response.json()
+            if response.status == 200:
+                return data.get('url')
+            LOGGER.debug(f"Failed to get link: {data.get('error')}")
+            return None
+    except aiohttp.ClientError as e:
+        # daemon not reachable - fall back to a one-off rclone process
+        LOGGER.debug(f"RCLONE : rcd unavailable ({str(e)}), using rclone link")
+        return await _link_subprocess(remote)
+
+
+async def _link_subprocess(remote: str):
+    task = await asyncio.create_subprocess_exec(
+        'rclone', 'link', '--config', './rclone.conf', f"{Config.RCLONE_DEST}/{remote}",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await task.communicate()
+    if task.returncode == 0:
+        return stdout.decode().strip()
+    LOGGER.debug(f"Failed to get link: {stderr.decode().strip()}")
+    return None
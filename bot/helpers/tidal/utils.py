@@ -196,6 +196,7 @@ async def sort_album_from_artist(album_data: dict):
 
 
 async def ffmpeg_convert(input_file):
-    cmd = f'ffmpeg -i "{input_file}" -c:a copy -loglevel error -y "{input_file}.flac"'
-    task = await asyncio.create_subprocess_shell(cmd)
+    task = await asyncio.create_subprocess_exec(
+        'ffmpeg', '-i', input_file, '-c:a', 'copy', '-loglevel', 'error', '-y', f"{input_file}.flac"
+    )
     await task.wait()
\ No newline at end of file
@@ -1,7 +1,7 @@
 import os
 
 from ..settings import bot_set
-from .message import send_message, edit_message
+from .message import send_message, edit_message, upload_admission
 from .utils import *
 
 #
@@ -21,7 +21,7 @@ async def track_upload(metadata, user, disable_link=False):
             await post_simple_message(user, metadata, rclone_link, index_link)
 
     try:
-        os.remove(metadata['filepath'])
+        await remove_file(metadata['filepath'])
     except FileNotFoundError:
         pass
         
@@ -92,13 +92,20 @@ async def playlist_upload(metadata, user):
             if bot_set.disable_sort_link:
                 await rclone_upload(user, f"{Config.DOWNLOAD_BASE_DIR}/{user['r_id']}/")
             else:
-                for track in metadata['tracks']:
-                    try:
-                        rclone_link, index_link = await rclone_upload(user, track['filepath'])
-                        if not bot_set.disable_sort_link:
-                            await post_simple_message(user, track, rclone_link, index_link)
-                    except ValueError: # might try to upload track which is not available
-                        pass
+                # copy once, then resolve every track link concurrently
+                await rclone_copy(user)
+                basepath = f"{Config.DOWNLOAD_BASE_DIR}/{user['r_id']}/"
+                results = await asyncio.gather(
+                    *(create_link(track['filepath'], basepath) for track in metadata['tracks']),
+                    return_exceptions=True
+                )
+                for track, result in zip(metadata['tracks'], results):
+                    if isinstance(result, ValueError): # might try to upload track which is not available
+                        continue
+                    if isinstance(result, Exception):
+                        raise result
+                    rclone_link, index_link = result
+                    await post_simple_message(user, track, rclone_link, index_link)
         else:
             rclone_link, index_link = await rclone_upload(user, metadata['folderpath'])
             if metadata['poster_msg']:
@@ -123,14 +130,24 @@ async def rclone_upload(user, realpath):
     Returns:
         rclone_link, index_link
     """
-    path = f"{Config.DOWNLOAD_BASE_DIR}/{user['r_id']}/"
-    cmd = f'rclone copy --config ./rclone.conf "{path}" "{Config.RCLONE_DEST}"'
-    task = await asyncio.create_subprocess_shell(cmd)
-    await task.wait()
+    await rclone_copy(user)
     r_link, i_link = await create_link(realpath, Config.DOWNLOAD_BASE_DIR + f"/{user['r_id']}/")
     return r_link, i_link
 
 
+async def rclone_copy(user):
+    """
+    Copies the user task folder to Config.RCLONE_DEST
+    Args:
+        user: user details
+    """
+    path = f"{Config.DOWNLOAD_BASE_DIR}/{user['r_id']}/"
+    task = await asyncio.create_subprocess_exec(
+        'rclone', 'copy', '--config', './rclone.conf', path, Config.RCLONE_DEST
+    )
+    await task.wait()
+
+
 async def local_upload(metadata, user):
     """
     Copies directory to local storage and merges contents if the destination exists.
@@ -156,7 +173,7 @@ async def local_upload(metadata, user):
     else:
         shutil.copytree(to_move, destination)
     
-    shutil.rmtree(to_move)
+    await remove_folder(to_move)
 
 
 async def telegram_upload(track, user):
@@ -175,12 +192,21 @@ async def batch_telegram_upload(metadata, user):
         user: user details
     """
     if metadata['type'] == 'album' or metadata['type'] == 'playlist':
-        for track in metadata['tracks']:
-            try:
-                await telegram_upload(track, user)
-            except FileNotFoundError:
-                pass
+        tracks = metadata['tracks']
     elif metadata['type'] == 'artist':
-        for album in metadata['albums']:
-            for track in album['tracks']:
-                await telegram_upload(track, user)
+        tracks = [track for album in metadata['albums'] for track in album['tracks']]
+    else:
+        return
+
+    async def sem_upload(track):
+        async with upload_admission:
+            await telegram_upload(track, user)
+
+    results = await asyncio.gather(
+        *(sem_upload(track) for track in tracks),
+        return_exceptions=True
+    )
+    for result in results:
+        # FileNotFoundError - track might not be available
+        if isinstance(result, Exception) and not isinstance(result, FileNotFoundError):
+            LOGGER.error(f"Track upload failed: {str(result)}")
@@ -19,9 +19,14 @@ from ..logger import LOGGER
 from ..settings import bot_set
 from .buttons.links import links_button
 from .message import send_message, edit_message
+from .rclone_rc import public_link
 
 
 MAX_SIZE = 1.9 * 1024 * 1024 * 1024  # 2GB
+# Already compressed media - deflating these only burns CPU, so they are stored as is
+STORED_EXTENSIONS = frozenset((
+    '.flac', '.m4a', '.mp3', '.mp4', '.ogg', '.opus', '.aac', '.wav', '.mkv', '.jpg', '.jpeg', '.png', '.webp'
+))
 # download folder structure : BASE_DOWNLOAD_DIR + message_r_id
 
 async def download_file(url, path, retries=3, timeout=30):
@@ -63,6 +68,25 @@ async def download_file(url, path, retries=3, timeout=30):
 
 
 
+async def remove_file(path):
+    """
+    Deletes a file in the default executor so the event loop is not blocked
+    Args:
+        path: path of the file to remove
+    """
+    await asyncio.get_running_loop().run_in_executor(None, os.remove, path)
+
+
+async def remove_folder(path):
+    """
+    Deletes a folder tree in the default executor so the event loop is not blocked
+    Args:
+        path: path of the folder to remove
+    """
+    await asyncio.get_running_loop().run_in_executor(None, shutil.rmtree, path)
+
+
+
 async def format_string(text:str, data:dict, user=None):
     """
     Args:
@@ -133,20 +157,7 @@ async def create_link(path, basepath):
     index_link = None
 
     if bot_set.link_options == 'RCLONE' or bot_set.link_options=='Both':
-        cmd = f'rclone link --config ./rclone.conf "{Config.RCLONE_DEST}/{path}"'
-        task = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-
-        stdout, stderr = await task.communicate()
-
-        if task.returncode == 0:
-            rclone_link = stdout.decode().strip()
-        else:
-            error_message = stderr.decode().strip()
-            LOGGER.debug(f"Failed to get link: {error_message}")
+        rclone_link = await public_link(path)
     if bot_set.link_options == 'Index' or bot_set.link_options=='Both':
         if Config.INDEX_LINK:
             index_link =  Config.INDEX_LINK + '/' + quote(path)
@@ -182,17 +193,19 @@ def split_zip_folder(folderpath) -> list:
         else:
             zip_path = f"{zip_name}.part{part_num}.zip"
 
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
             for file_path, arcname in files_to_add:
-                zipf.write(file_path, arcname)
+                zipf.write(file_path, arcname, compress_type=zip_compress_type(file_path))
                 os.remove(file_path)  # Delete the file after zipping
         return zip_path
 
+    # os.walk paths all start with folderpath, so the arcname is a plain slice
+    base_len = len(os.path.join(folderpath, ''))
     for root, dirs, files in os.walk(folderpath):
         for file in files:
             file_path = os.path.join(root, file)
             file_size = os.path.getsize(file_path)
-            arcname = os.path.relpath(file_path, folderpath)
+            arcname = file_path[base_len:]
 
             # If adding this file would exceed the max size, create a zip for the current files
             if current_size + file_size > MAX_SIZE:
@@ -212,6 +225,13 @@ def split_zip_folder(folderpath) -> list:
     return zip_paths
 
 
+def zip_compress_type(file_path) -> int:
+    """Store media files, deflate the rest (lyrics, text sidecars) at the ZipFile compresslevel"""
+    if os.path.splitext(file_path)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
 def zip_folder(folderpath) -> str:
     """
     Args:
@@ -221,11 +241,12 @@ def zip_folder(folderpath) -> str:
     """
     zip_path = f"{folderpath}.zip"
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    base_len = len(os.path.join(folderpath, ''))
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
         for root, dirs, files in os.walk(folderpath):
             for file in files:
                 file_path = os.path.join(root, file)
-                zipf.write(file_path, os.path.relpath(file_path, folderpath))
+                zipf.write(file_path, file_path[base_len:], compress_type=zip_compress_type(file_path))
                 # Remove file after adding to the zip
                 os.remove(file_path)
     
@@ -368,19 +389,19 @@ async def cleanup(user=None, metadata=None, ):
             if is_zip:
                 if type(metadata['folderpath']) == list:
                     for i in metadata['folderpath']:
-                        os.remove(i)
+                        await remove_file(i)
                 else:
-                    os.remove(metadata['folderpath'])
+                    await remove_file(metadata['folderpath'])
             else:
-                shutil.rmtree(metadata['folderpath'])
+                await remove_folder(metadata['folderpath'])
         except FileNotFoundError:
             pass
     if user:
         try:
-            shutil.rmtree(f"{Config.DOWNLOAD_BASE_DIR}/{user['r_id']}/")
+            await remove_folder(f"{Config.DOWNLOAD_BASE_DIR}/{user['r_id']}/")
         except Exception as e:
             LOGGER.info(e)
         try:
-            shutil.rmtree(f"{Config.DOWNLOAD_BASE_DIR}/{user['r_id']}-temp/")
+            await remove_folder(f"{Config.DOWNLOAD_BASE_DIR}/{user['r_id']}-temp/")
         except Exception as e:
             LOGGER.info(e)
@@ -1,3 +1,4 @@
+from urllib.parse import urlsplit
 from pyrogram.types import Message
 from pyrogram import Client, filters
 
@@ -78,6 +79,37 @@ def parse_options(parts: list) -> dict:
     return options
 
 
+async def _tidal(link, user, options):
+    await start_tidal(link, user)
+
+
+async def _deezer(link, user, options):
+    await start_deezer(link, user)
+
+
+async def _qobuz(link, user, options):
+    user['provider'] = 'Qobuz'
+    await start_qobuz(link, user)
+
+
+async def _spotify(link, user, options):
+    await send_message(user, "Spotify support coming soon!")
+
+
+# hostname -> provider handler
+PROVIDERS = {
+    'tidal.com': _tidal,
+    'listen.tidal.com': _tidal,
+    'deezer.com': _deezer,
+    'link.deezer.com': _deezer,
+    'play.qobuz.com': _qobuz,
+    'open.qobuz.com': _qobuz,
+    'qobuz.com': _qobuz,
+    'open.spotify.com': _spotify,
+    'music.apple.com': handle_apple_download
+}
+
+
 async def start_link(link: str, user: dict, options: dict = None):
     """
     Route download request to appropriate provider handler
@@ -87,22 +119,14 @@ async def start_link(link: str, user: dict, options: dict = None):
         user: User details dictionary
         options: Command-line options passed by user
     """
-    tidal = ["https://tidal.com", "https://listen.tidal.com", "tidal.com", "listen.tidal.com"]
-    deezer = ["https://link.deezer.com", "https://deezer.com", "deezer.com", "https://www.deezer.com", "link.deezer.com"]
-    qobuz = ["https://play.qobuz.com", "https://open.qobuz.com", "https://www.qobuz.com"]
-    spotify = ["https://open.spotify.com"]
-    apple_music = ["https://music.apple.com"]
-    
-    if link.startswith(tuple(tidal)):
-        await start_tidal(link, user)
-    elif link.startswith(tuple(deezer)):
-        await start_deezer(link, user)
-    elif link.startswith(tuple(qobuz)):
-        user['provider'] = 'Qobuz'
-        await start_qobuz(link, user)
-    elif link.startswith(tuple(spotify)):
-        await send_message(user, "Spotify support coming soon!")
-    elif link.startswith(tuple(apple_music)):
-        await handle_apple_download(link, user, options)
+    # links like "tidal.com/..." come without a scheme
+    try:
+        host = urlsplit(link if '://' in link else f"https://{link}").hostname or ''
+    except ValueError:
+        # malformed URL (e.g. unbalanced "[") - reported as unsupported below
+        host = ''
+    handler = PROVIDERS.get(host) or PROVIDERS.get(host.removeprefix('www.'))
+    if handler:
+        await handler(link, user, options)
     else:
         await send_message(user, lang.s.ERR_UNSUPPORTED_LINK)
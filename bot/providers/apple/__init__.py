@@ -1,25 +1,34 @@
-# bot/providers/__init__.py
+# bot/providers/apple/__init__.py
 
-from .apple import AppleMusicCore
-from .uploader import (
-    apple_track_upload,
-    apple_album_upload,
-    apple_music_video_upload,
-    apple_playlist_upload,
-    apple_artist_upload,
-    apple_rclone_upload
-)
+import importlib
 
-__all__ = [
-    'AppleMusicCore',
-    'start_apple',
-    'run_apple_downloader',
-    'handle_apple_download',
-    'extract_apple_metadata',
-    'apple_track_upload',
-    'apple_album_upload',
-    'apple_music_video_upload',
-    'apple_playlist_upload',
-    'apple_artist_upload',
-    'apple_rclone_upload'
-]
+# Public name -> submodule providing it. Imported on first access (PEP 562)
+# so importing the package does not pull in mutagen, zipfile and the uploaders.
+_EXPORTS = {
+    'AppleMusicCore': '.apple',
+    'start_apple': '.apple',
+    'run_apple_downloader': '.downloader',
+    'handle_apple_download': '.downloader',
+    'extract_apple_metadata': '.metadata',
+    'apple_track_upload': '.uploader',
+    'apple_album_upload': '.uploader',
+    'apple_music_video_upload': '.uploader',
+    'apple_playlist_upload': '.uploader',
+    'apple_artist_upload': '.uploader',
+    'apple_rclone_upload': '.uploader'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
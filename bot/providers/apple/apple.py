@@ -1,4 +1,5 @@
 import os
+import re
 import logging
 import asyncio
 from config import Config
@@ -7,6 +8,7 @@ from .metadata import extract_apple_metadata
 from .utils import (
     create_apple_directory,
     cleanup_apple_files,
+    APPLE_BASE_DIR,
     validate_apple_url
 )
 from .uploader import (
@@ -16,11 +18,37 @@ from .uploader import (
     apple_playlist_upload,
     apple_artist_upload
 )
-from bot.helpers.utils import format_string
 from bot.logger import LOGGER
 
 logger = logging.getLogger(__name__)
 
+# Display name stored on every item so uploaders never need a fallback lookup
+PROVIDER_NAME = "Apple Music"
+
+COMPLETION_TEXT = (
+    "✅ Apple Music download completed!\n"
+    "Format: {format}\n"
+    "Quality: {quality}"
+).format_map
+
+# Content kind from the URL path segment, one scan; group name is the content type
+URL_KIND_RE = re.compile(r'/(?P<video>music-video)/|/(?P<playlist>playlist)/|/(?P<artist>artist)/')
+
+MEDIA_EXTENSIONS = frozenset({'.m4a', '.flac', '.mp4', '.mov'})
+
+def _scan_media(directory: str) -> list:
+    """Media file paths under directory, using scandir's cached entry types (no stat calls)"""
+    paths = []
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS:
+                    paths.append(entry.path)
+    return paths
+
 class AppleMusicCore:
     """Main Apple Music processor handling all operations"""
     def __init__(self):
@@ -36,7 +64,12 @@ class AppleMusicCore:
             if not validate_apple_url(url):
                 raise ValueError("Invalid Apple Music URL format")
 
-            user_dir = create_apple_directory(user['user_id'])
+            # directory tree and config.yaml are written off the event loop
+            user_dir = await asyncio.get_running_loop().run_in_executor(
+                None, create_apple_directory, user['user_id']
+            )
+            # Shared by every upload of this task for rclone relative paths
+            user['base_path'] = APPLE_BASE_DIR
             
             download_result = await run_apple_downloader(
                 url, 
@@ -50,31 +83,38 @@ class AppleMusicCore:
 
             content_type, processed_data = await self._process_content(user_dir, url)
             await self._handle_upload(content_type, processed_data, user)
-            cleanup_apple_files(user['user_id'])
+            await asyncio.get_running_loop().run_in_executor(None, cleanup_apple_files, user['user_id'])
             await self._send_completion_message(user)
 
         except Exception as e:
             logger.error(f"Apple Music processing failed: {str(e)}", exc_info=True)
-            cleanup_apple_files(user['user_id'])
+            await asyncio.get_running_loop().run_in_executor(None, cleanup_apple_files, user['user_id'])
             await self._handle_error(user, str(e))
             raise
 
     async def _process_content(self, directory: str, url: str):
         """Process downloaded files and extract metadata"""
+        loop = asyncio.get_running_loop()
+        paths = await loop.run_in_executor(None, _scan_media, directory)
+        # One cover cache per task: tracks sharing artwork get one cover file in this task's folder,
+        # removed with it by cleanup_apple_files - nothing outlives the task
+        covers = {}
+        # mutagen parsing is blocking file I/O - overlap it in the default executor
+        results = await asyncio.gather(
+            *(loop.run_in_executor(None, extract_apple_metadata, path, covers) for path in paths),
+            return_exceptions=True
+        )
+
         items = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if any(file_path.endswith(ext) for ext in ('.m4a', '.flac', '.mp4', '.mov')):
-                    try:
-                        metadata = extract_apple_metadata(file_path)
-                        metadata.update({
-                            'filepath': file_path,
-                            'provider': self.name
-                        })
-                        items.append(metadata)
-                    except Exception as e:
-                        LOGGER.error(f"Metadata extraction failed: {str(e)}")
+        for file_path, metadata in zip(paths, results):
+            if isinstance(metadata, Exception):
+                LOGGER.error(f"Metadata extraction failed: {str(metadata)}")
+                continue
+            metadata.update({
+                'filepath': file_path,
+                'provider': PROVIDER_NAME
+            })
+            items.append(metadata)
 
         if not items:
             raise ValueError("No valid media files found")
@@ -83,17 +123,14 @@ class AppleMusicCore:
             'items': items,
             'folderpath': directory,
             'title': items[0].get('album', items[0]['title']),
-            'artist': items[0]['artist']
+            'artist': items[0]['artist'],
+            'provider': PROVIDER_NAME
         }
 
     def _determine_content_type(self, url: str, items: list) -> str:
         """Identify content type from URL and files"""
-        if 'music-video' in url:
-            return 'video'
-        if 'playlist' in url:
-            return 'playlist'
-        if 'artist' in url:
-            return 'artist'
+        if match := URL_KIND_RE.search(url):
+            return match.lastgroup
         return 'album' if len(items) > 1 else 'track'
 
     async def _handle_upload(self, content_type: str, data: dict, user: dict):
@@ -114,16 +151,11 @@ class AppleMusicCore:
     async def _send_completion_message(self, user: dict):
         """Send final success message"""
         await user['bot_msg'].edit_text(
-            format_string(
-                "✅ Apple Music download completed!\n"
-                "Format: {format}\n"
-                "Quality: {quality}",
-                {
-                    'format': Config.APPLE_DEFAULT_FORMAT.upper(),
-                    'quality': Config.APPLE_ALAC_QUALITY if Config.APPLE_DEFAULT_FORMAT == 'alac' 
-                             else Config.APPLE_ATMOS_QUALITY
-                }
-            )
+            COMPLETION_TEXT({
+                'format': Config.APPLE_DEFAULT_FORMAT.upper(),
+                'quality': Config.APPLE_ALAC_QUALITY if Config.APPLE_DEFAULT_FORMAT == 'alac' 
+                         else Config.APPLE_ATMOS_QUALITY
+            })
         )
 
     async def _handle_error(self, user: dict, error: str):
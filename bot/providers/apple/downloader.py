@@ -1,108 +1,214 @@
 import os
 import re
 import asyncio
+import logging
+import signal
+from collections import deque
 from config import Config
 from bot.logger import LOGGER
 from bot.helpers.message import edit_message
 from .utils import (
     validate_apple_url,
-    extract_content_id,
     verify_apple_dependencies,
-    cleanup_apple_files
+    cleanup_apple_files,
+    build_apple_options
 )
 
-# Global config path (set in config.yaml)
-APPLE_CONFIG_PATH = os.path.join(
-    os.path.dirname(Config.DOWNLOADER_PATH),
-    "config.yaml"
+# Compiled once; matched against raw output bytes so lines without a hit are never decoded.
+# Progress and error markers share one alternation so each block is scanned once
+OUTPUT_RE = re.compile(
+    rb"(?P<progress>\d+)%"
+    rb"|(?P<error>Separator is not found|DRM protected|Invalid media token|Storefront mismatch|HTTP 403)"
 )
+# progress bars redraw with \r, so both end a line
+LINE_END_RE = re.compile(rb"\r\n?|\n")
+ERROR_TAIL_LINES = 5
+
+# Downloader folder, used as its working directory
+APPLE_DOWNLOADER_DIR = os.path.dirname(Config.DOWNLOADER_PATH)
+
+# Global config path (set in config.yaml)
+APPLE_CONFIG_PATH = os.path.join(APPLE_DOWNLOADER_DIR, "config.yaml")
+
+# Process environment, built once - .env is already loaded by config at import
+APPLE_ENV = {**os.environ, "APPLE_CONFIG": APPLE_CONFIG_PATH}
+
+# Set after the first successful tool/config check
+setup_verified = False
 
-async def run_apple_downloader(url: str, user_id: int, options: list = None, user: dict = None) -> dict:
+# Bounds concurrent downloader processes (and their pipes) across all users
+apple_downloads = asyncio.Semaphore(Config.APPLE_MAX_CONCURRENT)
+
+async def run_apple_downloader(url: str, user_id: int, options: dict = None, user: dict = None) -> dict:
     """
     Execute downloader using global config.yaml paths
     Removed --output flag dependency
     """
     try:
-        # Verify dependencies and config
-        verify_apple_dependencies()
-        if not os.path.exists(APPLE_CONFIG_PATH):
-            raise FileNotFoundError(f"Apple config missing at {APPLE_CONFIG_PATH}")
+        # Verify dependencies and config - once per process, they don't go away
+        global setup_verified
+        if not setup_verified:
+            verify_apple_dependencies()
+            if not os.path.exists(Config.DOWNLOADER_PATH):
+                raise FileNotFoundError(f"Apple downloader missing at {Config.DOWNLOADER_PATH}")
+            if not os.path.exists(APPLE_CONFIG_PATH):
+                raise FileNotFoundError(f"Apple config missing at {APPLE_CONFIG_PATH}")
+            setup_verified = True
 
         # Build base command
-        cmd = [
-            Config.DOWNLOADER_PATH,
-            *([] if not options else options),
-            url
-        ]
-
-        LOGGER.info(f"Apple Command: {' '.join(cmd)}")
-
-        # Execute with global config
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            cwd=os.path.dirname(Config.DOWNLOADER_PATH),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            env={**os.environ, "APPLE_CONFIG": APPLE_CONFIG_PATH}
-        )
-
-        return await _monitor_download_process(process, user)
+        cmd = [Config.DOWNLOADER_PATH, *build_apple_options(options), url]
+
+        if LOGGER.logger.isEnabledFor(logging.INFO):
+            LOGGER.info(f"Apple Command: {' '.join(cmd)}")
+
+        # Execute with global config - excess downloads queue here
+        async with apple_downloads:
+            transport, protocol = await asyncio.get_running_loop().subprocess_exec(
+                lambda: _DownloaderProtocol(user),
+                *cmd,
+                cwd=APPLE_DOWNLOADER_DIR,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                # one merged pipe - nothing left undrained to fill up and stall the downloader
+                stderr=asyncio.subprocess.STDOUT,
+                # own process group, so the script's children can be stopped with it
+                start_new_session=True,
+                env=APPLE_ENV
+            )
+
+            return await _monitor_download_process(transport, protocol, user)
     except Exception as e:
         LOGGER.error(f"Setup Failed: {str(e)}")
         return {'success': False, 'error': str(e)}
 
-async def _monitor_download_process(process, user: dict) -> dict:
+class _DownloaderProtocol(asyncio.SubprocessProtocol):
+    """
+    Scans downloader output as the pipe transport delivers it,
+    without a StreamReader buffer and read() round trips in between
+    """
+    def __init__(self, user: dict):
+        # no status message to edit - only scan for errors
+        self.user = user if user and 'bot_msg' in user else None
+        self.pending = b''
+        # last output lines, reported if the downloader exits with an error
+        self.tail = deque(maxlen=ERROR_TAIL_LINES)
+        self.error = None
+        self.transport = None
+        self.finished = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def pipe_data_received(self, fd, data):
+        *lines, self.pending = LINE_END_RE.split(self.pending + data)
+        self._feed(lines)
+
+    def pipe_connection_lost(self, fd, exc):
+        if self.pending:
+            self._feed([self.pending])
+            self.pending = b''
+
+    def connection_lost(self, exc):
+        # process exited and all of its pipes are closed
+        if not self.finished.done():
+            self.finished.set_result(self.transport.get_returncode())
+
+    def _feed(self, lines: list):
+        if self.error:
+            return
+        self.tail.extend(line for line in lines if line.strip())
+        try:
+            _handle_output(b'\n'.join(lines), self.user)
+        except RuntimeError as e:
+            self.error = e
+            _stop_process_group(self.transport.get_pid())
+
+async def _monitor_download_process(transport, protocol, user: dict) -> dict:
     """Monitor process using config.yaml paths"""
-    error_patterns = [
-        r"Separator is not found",
-        r"DRM protected",
-        r"Invalid media token",
-        r"Storefront mismatch"
-    ]
-    
     try:
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
-                
-            line_str = line.decode().strip()
-            
-            # Error detection
-            if any(re.search(pattern, line_str) for pattern in error_patterns):
-                raise RuntimeError(line_str)
-            
-            # Progress updates
-            if user and (progress := _parse_progress(line_str)):
-                await _update_progress(user, progress)
+        # shielded - on cancellation the future must survive for the cleanup below
+        returncode = await asyncio.shield(protocol.finished)
+        if protocol.error:
+            raise protocol.error
 
         # Verify completion
-        stdout, stderr = await process.communicate()
-        if process.returncode != 0:
-            error = stderr.decode().strip() or "Unknown error"
+        if returncode != 0:
+            error = b'\n'.join(protocol.tail).decode(errors='replace').strip() or "Unknown error"
             raise RuntimeError(error)
             
         return {'success': True}
     except Exception as e:
         LOGGER.error(f"Download Failed: {str(e)}")
         return {'success': False, 'error': str(e)}
+    finally:
+        if user:
+            _cancel_progress(user)
+        if transport.get_returncode() is None:
+            # task cancelled - stop the script and everything it started
+            _stop_process_group(transport.get_pid())
+            await protocol.finished
+        transport.close()
 
-def _parse_progress(line: str) -> int:
-    """Extract percentage from output"""
-    match = re.search(r'(\d+)%', line)
-    return int(match.group(1)) if match else None
-
-async def _update_progress(user: dict, progress: int):
-    """Throttled progress updates"""
+def _stop_process_group(pid: int):
     try:
-        if progress % 5 == 0:
+        os.killpg(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+def _handle_output(block: bytes, user: dict):
+    """
+    Check a block of complete output lines in a single regex pass,
+    then report only the latest progress
+    """
+    percent = None
+    for match in OUTPUT_RE.finditer(block):
+        # Error detection
+        if match.lastgroup == 'error':
+            start = block.rfind(b'\n', 0, match.start()) + 1
+            end = block.find(b'\n', match.end())
+            raise RuntimeError(block[start:end if end != -1 else None].decode(errors='replace').strip())
+        percent = match.group('progress')
+
+    # Progress updates
+    if user and percent and (percent := int(percent)):
+        _update_progress(user, percent)
+
+def _update_progress(user: dict, progress: int):
+    """
+    Throttled progress updates - at most one edit per APPLE_PROGRESS_MIN_INTERVAL, only on change.
+    Edits go through one background flusher per task so reading the downloader output
+    never waits on Telegram; values arriving while an edit is in flight collapse to the latest
+    """
+    now = asyncio.get_running_loop().time()
+    if progress == user.get('_last_progress'):
+        return
+    # 100% always goes out, it may be the last line before the process exits
+    if progress < 100 and now - user.get('_last_edit_ts', float('-inf')) < Config.APPLE_PROGRESS_MIN_INTERVAL:
+        return
+    user['_last_progress'] = progress
+    user['_last_edit_ts'] = now
+    user['_pending_progress'] = progress
+    task = user.get('_edit_task')
+    if task is None or task.done():
+        user['_edit_task'] = asyncio.create_task(_flush_progress(user))
+
+async def _flush_progress(user: dict):
+    while (progress := user.pop('_pending_progress', None)) is not None:
+        try:
             await edit_message(
                 user['bot_msg'],
                 f"🍎 Apple Music Progress: {progress}%\n"
                 f"Format: {Config.APPLE_DEFAULT_FORMAT.upper()}"
             )
-    except Exception as e:
-        LOGGER.debug(f"Progress update skipped: {str(e)}")
+        except Exception as e:
+            LOGGER.debug(f"Progress update skipped: {str(e)}")
+
+def _cancel_progress(user: dict):
+    """Drop pending progress edits so they cannot land after a newer message"""
+    user.pop('_pending_progress', None)
+    task = user.pop('_edit_task', None)
+    if task and not task.done():
+        task.cancel()
 
 async def handle_apple_download(url: str, user: dict, options: dict = None):
     """Main handler using config.yaml paths"""
@@ -121,45 +227,4 @@ async def handle_apple_download(url: str, user: dict, options: dict = None):
         LOGGER.error(f"Critical Error: {str(e)}")
         await edit_message(user['bot_msg'], f"⚠️ Error: {str(e)}")
     finally:
-        cleanup_apple_files(user['user_id'])
-
-async def start_apple(link: str, user: dict, options: dict = None):
-    """Entry point with global config"""
-    try:
-        await edit_message(user['bot_msg'], "Starting Apple Music download...")
-        result = await run_apple_downloader(link, user['user_id'], options, user)
-        
-        if result['success']:
-            await edit_message(user['bot_msg'], "✅ Success!")
-        else:
-            await edit_message(user['bot_msg'], f"❌ Failed: {result['error']}")
-    except Exception as e:
-        LOGGER.error(f"Start Failed: {str(e)}")
-        await edit_message(user['bot_msg'], f"⚠️ Critical Error: {str(e)}")
-    finally:
-        cleanup_apple_files(user['user_id'])
-
-def build_apple_options(options: dict) -> list:
-    """Original option mapping preserved"""
-    option_map = {
-        'aac': '--aac',
-        'aac-type': '--aac-type',
-        'alac-max': '--alac-max',
-        'all-album': '--all-album',
-        'atmos': '--atmos',
-        'atmos-max': '--atmos-max',
-        'debug': '--debug',
-        'mv-audio-type': '--mv-audio-type',
-        'mv-max': '--mv-max',
-        'select': '--select',
-        'song': '--song'
-    }
-    
-    cmd = []
-    for key, value in (options or {}).items():
-        if key in option_map:
-            if isinstance(value, bool):
-                cmd.append(option_map[key])
-            else:
-                cmd.extend([option_map[key], str(value)])
-    return cmd
+        await asyncio.get_running_loop().run_in_executor(None, cleanup_apple_files, user['user_id'])
@@ -1,7 +1,9 @@
 import os
-import re
 import base64
-import mutagen
+import hashlib
+import struct
+import threading
+from concurrent.futures import Future
 from pathlib import Path
 from mutagen.mp4 import MP4
 from mutagen.flac import FLAC
@@ -9,61 +11,196 @@ from mutagen.mp3 import EasyMP3
 from mutagen import File
 from bot.logger import LOGGER
 
-def extract_apple_metadata(file_path: str) -> dict:
+def extract_apple_metadata(file_path: str, covers: dict = None) -> dict:
     """
     Enhanced metadata extraction with format detection
     Preserves original structure with improved error handling
+    Args:
+        file_path: media file
+        covers: per-task cover cache shared by the files of one download,
+            so identical artwork is written once (None - one cover per file)
     """
     try:
-        ext = Path(file_path).suffix.lower()
-        handlers = {
-            '.m4a': _extract_m4a_metadata,
-            '.mp4': _extract_video_metadata,
-            '.m4v': _extract_video_metadata,
-            '.mov': _extract_video_metadata,
-            '.flac': _extract_flac_metadata,
-            '.mp3': _extract_mp3_metadata
-        }
-        return handlers.get(ext, _extract_generic_metadata)(file_path)
+        ext = os.path.splitext(file_path)[1].lower()
+        return METADATA_HANDLERS.get(ext, _extract_generic_metadata)(file_path, covers)
     except Exception as e:
         LOGGER.error(f"Metadata Error: {str(e)}")
         return _default_metadata(file_path)
 
-def _extract_m4a_metadata(file_path: str) -> dict:
+def _extract_m4a_metadata(file_path: str, covers: dict = None) -> dict:
     """Apple Lossless (ALAC) metadata with enhanced fields"""
     try:
-        audio = MP4(file_path)
+        try:
+            atoms = _read_mp4_atoms(file_path)
+        except (struct.error, ValueError, IndexError):
+            atoms = None
+        if atoms:
+            tags, length, codec, bitrate = atoms
+        else:
+            tags = MP4(file_path)
+            length, codec, bitrate = tags.info.length, tags.info.codec, tags.info.bitrate
+        cover = _extract_cover_art(tags, file_path, covers)
         return {
-            'title': audio.get('\xa9nam', ['Unknown'])[0],
-            'artist': audio.get('\xa9ART', ['Unknown Artist'])[0],
-            'album': audio.get('\xa9alb', ['Unknown Album'])[0],
-            'duration': int(audio.info.length),
-            'tracknumber': str(audio.get('trkn', [(0,0)])[0][0]).zfill(2),
-            'genre': audio.get('\xa9gen', [''])[0],
-            'date': audio.get('\xa9day', [''])[0],
-            'isrc': audio.get('----:com.apple.iTunes:ISRC', [''])[0],
-            'cover': _extract_cover_art(audio, file_path),
-            'thumbnail': _extract_cover_art(audio, file_path),
-            'explicit': 'Explicit' if audio.get('rtng', [0])[0] == 1 else '',
-            'bitrate': audio.info.bitrate,
-            'codec': 'ALAC' if 'alac' in audio.info.codec else 'AAC'
+            'title': tags.get('\xa9nam', ['Unknown'])[0],
+            'artist': tags.get('\xa9ART', ['Unknown Artist'])[0],
+            'album': tags.get('\xa9alb', ['Unknown Album'])[0],
+            'duration': int(length),
+            'tracknumber': str(tags.get('trkn', [(0,0)])[0][0]).zfill(2),
+            'genre': tags.get('\xa9gen', [''])[0],
+            'date': tags.get('\xa9day', [''])[0],
+            'isrc': tags.get('----:com.apple.iTunes:ISRC', [''])[0],
+            'cover': cover,
+            'thumbnail': cover,
+            'explicit': 'Explicit' if tags.get('rtng', [0])[0] == 1 else '',
+            'bitrate': bitrate,
+            'codec': 'ALAC' if 'alac' in codec else 'AAC'
         }
     except Exception as e:
         LOGGER.warning(f"ALAC Extraction Failed: {str(e)}")
         return _default_metadata(file_path)
 
-def _extract_video_metadata(file_path: str) -> dict:
+def _read_mp4_atoms(file_path: str):
+    """
+    Reads only the moov box of an MP4 file, seeking over mdat
+    Returns:
+        tuple or None: (tags, duration, codec, bitrate) with tags keyed like mutagen's MP4,
+        None when the file has no usable moov/mvhd (caller falls back to mutagen)
+    """
+    with open(file_path, 'rb') as f:
+        moov, mdat_size = _read_moov(f)
+    if moov is None:
+        return None
+
+    duration = None
+    codec = ''
+    tags = {}
+    for kind, start, end in _iter_boxes(moov, 0, len(moov)):
+        if kind == b'mvhd':
+            if moov[start] == 1:
+                timescale, length = struct.unpack_from('>IQ', moov, start + 20)
+            else:
+                timescale, length = struct.unpack_from('>II', moov, start + 12)
+            duration = length / timescale if timescale else 0
+        elif kind == b'trak' and not codec:
+            stsd = _find_box(moov, start, end, (b'mdia', b'minf', b'stbl', b'stsd'))
+            if stsd:
+                # version/flags, entry count, then the first sample entry's size and type
+                codec = moov[stsd[0] + 12:stsd[0] + 16].decode('latin-1')
+        elif kind == b'udta':
+            meta = _find_box(moov, start, end, (b'meta',))
+            if meta:
+                # meta is a full box - children start after version/flags
+                ilst = _find_box(moov, meta[0] + 4, meta[1], (b'ilst',))
+                if ilst:
+                    _read_ilst(moov, ilst[0], ilst[1], tags)
+
+    if duration is None:
+        return None
+    bitrate = int(mdat_size * 8 / duration) if duration else 0
+    return tags, duration, codec, bitrate
+
+def _read_moov(f):
+    """Walk top level boxes, returning the moov payload and the total mdat size"""
+    moov = None
+    mdat_size = 0
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            break
+        size, kind = struct.unpack('>I4s', head)
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header = 16
+        elif size == 0:
+            # box runs to the end of the file
+            if kind == b'mdat':
+                mdat_size += os.fstat(f.fileno()).st_size - f.tell()
+            elif kind == b'moov':
+                moov = f.read()
+            break
+        if size < header:
+            raise ValueError(f"Invalid MP4 box size {size}")
+
+        if kind == b'moov':
+            moov = f.read(size - header)
+        else:
+            if kind == b'mdat':
+                mdat_size += size - header
+            f.seek(size - header, 1)
+    return moov, mdat_size
+
+def _iter_boxes(buf: bytes, start: int, end: int):
+    """Yield (type, payload start, payload end) for boxes in buf[start:end]"""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise ValueError(f"Invalid MP4 box size {size}")
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+def _find_box(buf: bytes, start: int, end: int, path: tuple):
+    for kind, box_start, box_end in _iter_boxes(buf, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return box_start, box_end
+            return _find_box(buf, box_start, box_end, path[1:])
+    return None
+
+def _read_ilst(buf: bytes, start: int, end: int, tags: dict):
+    """iTunes metadata items -> tags, with the same keys and value shapes as mutagen"""
+    for kind, item_start, item_end in _iter_boxes(buf, start, end):
+        if kind == b'----':
+            mean = name = ''
+            for sub, sub_start, sub_end in _iter_boxes(buf, item_start, item_end):
+                if sub == b'mean':
+                    mean = buf[sub_start + 4:sub_end].decode('utf-8', 'replace')
+                elif sub == b'name':
+                    name = buf[sub_start + 4:sub_end].decode('utf-8', 'replace')
+            key = f"----:{mean}:{name}"
+        else:
+            key = kind.decode('latin-1')
+
+        values = []
+        for sub, data_start, data_end in _iter_boxes(buf, item_start, item_end):
+            if sub != b'data':
+                continue
+            # data box: type indicator, locale, value
+            data_type = struct.unpack_from('>I', buf, data_start)[0] & 0xFFFFFF
+            value = buf[data_start + 8:data_end]
+            if kind in (b'trkn', b'disk'):
+                values.append(struct.unpack_from('>2xHH', value))
+            elif kind == b'covr':
+                values.append(value)
+            elif data_type == 1:
+                values.append(value.decode('utf-8', 'replace'))
+            elif data_type == 21:
+                values.append(int.from_bytes(value, 'big', signed=True))
+            else:
+                values.append(value)
+        if values:
+            tags[key] = values
+
+def _extract_video_metadata(file_path: str, covers: dict = None) -> dict:
     """Video metadata extraction with resolution detection"""
     try:
         video = MP4(file_path)
+        cover = _extract_cover_art(video, file_path, covers)
         return {
             'title': video.get('\xa9nam', ['Unknown'])[0],
             'artist': video.get('\xa9ART', ['Unknown Artist'])[0],
             'duration': int(video.info.length),
             'width': video.get('width', [1920])[0],
             'height': video.get('height', [1080])[0],
-            'cover': _extract_cover_art(video, file_path),
-            'thumbnail': _extract_cover_art(video, file_path),
+            'cover': cover,
+            'thumbnail': cover,
             'resolution': f"{video.get('width', [1920])[0]}x{video.get('height', [1080])[0]}",
             'codec': video.info.codec_description
         }
@@ -71,7 +208,7 @@ def _extract_video_metadata(file_path: str) -> dict:
         LOGGER.warning(f"Video Extraction Failed: {str(e)}")
         return _default_metadata(file_path)
 
-def _extract_flac_metadata(file_path: str) -> dict:
+def _extract_flac_metadata(file_path: str, covers: dict = None) -> dict:
     """FLAC metadata with high-res audio support"""
     try:
         audio = FLAC(file_path)
@@ -82,7 +219,7 @@ def _extract_flac_metadata(file_path: str) -> dict:
             'duration': int(audio.info.length),
             'bitdepth': audio.info.bits_per_sample,
             'samplerate': audio.info.sample_rate,
-            'cover': _extract_cover_art(audio, file_path),
+            'cover': _extract_cover_art(audio, file_path, covers),
             'isrc': audio.get('isrc', [''])[0],
             'genre': audio.get('genre', [''])[0]
         }
@@ -90,7 +227,7 @@ def _extract_flac_metadata(file_path: str) -> dict:
         LOGGER.warning(f"FLAC Extraction Failed: {str(e)}")
         return _default_metadata(file_path)
 
-def _extract_mp3_metadata(file_path: str) -> dict:
+def _extract_mp3_metadata(file_path: str, covers: dict = None) -> dict:
     """MP3 metadata with ID3 tag support"""
     try:
         audio = EasyMP3(file_path)
@@ -101,13 +238,13 @@ def _extract_mp3_metadata(file_path: str) -> dict:
             'duration': int(audio.info.length),
             'tracknumber': audio.get('tracknumber', ['0'])[0],
             'genre': audio.get('genre', [''])[0],
-            'cover': _extract_cover_art(audio, file_path)
+            'cover': _extract_cover_art(audio, file_path, covers)
         }
     except Exception as e:
         LOGGER.warning(f"MP3 Extraction Failed: {str(e)}")
         return _default_metadata(file_path)
 
-def _extract_generic_metadata(file_path: str) -> dict:
+def _extract_generic_metadata(file_path: str, covers: dict = None) -> dict:
     """Fallback for unsupported formats"""
     try:
         audio = File(file_path)
@@ -116,59 +253,106 @@ def _extract_generic_metadata(file_path: str) -> dict:
             'artist': audio.get('artist', ['Unknown Artist'])[0],
             'album': audio.get('album', ['Unknown Album'])[0],
             'duration': int(audio.info.length),
-            'cover': _extract_cover_art(audio, file_path)
+            'cover': _extract_cover_art(audio, file_path, covers)
         }
     except Exception as e:
         LOGGER.warning(f"Generic Extraction Failed: {str(e)}")
         return _default_metadata(file_path)
 
-def _extract_cover_art(media, file_path: str) -> str:
+# File extension -> extractor, used by extract_apple_metadata
+METADATA_HANDLERS = {
+    '.m4a': _extract_m4a_metadata,
+    '.mp4': _extract_video_metadata,
+    '.m4v': _extract_video_metadata,
+    '.mov': _extract_video_metadata,
+    '.flac': _extract_flac_metadata,
+    '.mp3': _extract_mp3_metadata
+}
+
+# Guards lookups/inserts on the per-task covers dict - extraction runs in worker threads
+_cover_lock = threading.Lock()
+
+def _extract_cover_art(media, file_path: str, covers: dict = None) -> str:
     """Comprehensive cover art extraction from working utils.py"""
     try:
-        # MP4/ALAC cover art
-        if 'covr' in media:
-            cover_data = media['covr'][0]
-            cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
-            with open(cover_path, 'wb') as f:
-                f.write(cover_data)
-            return cover_path
-        
-        # ID3 (MP3) embedded art
-        if hasattr(media, 'tags') and 'APIC:' in media.tags:
-            pic = media.tags['APIC:'].data
-            cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
-            with open(cover_path, 'wb') as f:
-                f.write(pic)
-            return cover_path
-        
-        # FLAC embedded art
-        if isinstance(media, FLAC) and media.pictures:
-            for pic in media.pictures:
-                if pic.type == 3:  # Front cover
-                    cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
-                    with open(cover_path, 'wb') as f:
-                        f.write(pic.data)
-                    return cover_path
-        
-        # Vorbis comments (OGG/OPUS)
-        if 'metadata_block_picture' in media:
-            for block in media.get('metadata_block_picture', []):
-                try:
-                    data = base64.b64decode(block)
-                    pic = FLAC.Picture(data)
-                    if pic.type == 3:
-                        cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
-                        with open(cover_path, 'wb') as f:
-                            f.write(pic.data)
-                        return cover_path
-                except:
-                    continue
-        
-        return None
+        data = _cover_bytes(media)
+        return _save_cover(data, file_path, covers) if data else None
     except Exception as e:
         LOGGER.error(f"Cover Art Error: {str(e)}")
         return None
 
+def _cover_bytes(media) -> bytes:
+    """Embedded front cover bytes, or None"""
+    # MP4/ALAC cover art
+    if 'covr' in media:
+        return media['covr'][0]
+    
+    # ID3 (MP3) embedded art
+    if hasattr(media, 'tags') and 'APIC:' in media.tags:
+        return media.tags['APIC:'].data
+    
+    # FLAC embedded art
+    if isinstance(media, FLAC) and media.pictures:
+        for pic in media.pictures:
+            if pic.type == 3:  # Front cover
+                return pic.data
+    
+    # Vorbis comments (OGG/OPUS)
+    if 'metadata_block_picture' in media:
+        for block in media.get('metadata_block_picture', []):
+            try:
+                data = base64.b64decode(block)
+                pic = FLAC.Picture(data)
+                if pic.type == 3:
+                    return pic.data
+            except:
+                continue
+    
+    return None
+
+def _save_cover(data: bytes, file_path: str, covers: dict = None) -> str:
+    """
+    Write cover next to the track unless this task already wrote identical artwork.
+    covers maps sha1(cover bytes) -> Future of the cover path and only lives for one download,
+    so paths never point into another task's folder; the files go with the task folder.
+    """
+    if covers is None:
+        cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
+        _write_bytes(cover_path, data)
+        return cover_path
+
+    digest = hashlib.sha1(data).digest()
+    # the lock only covers the dict lookup/insert - the first thread to see a digest
+    # parks a Future there and writes the file outside the lock, others wait on it
+    with _cover_lock:
+        pending = covers.get(digest)
+        if pending is None:
+            covers[digest] = owned = Future()
+    if pending is not None:
+        return pending.result()
+
+    cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
+    try:
+        _write_bytes(cover_path, data)
+    except BaseException as e:
+        # let the next track with this artwork try again
+        with _cover_lock:
+            del covers[digest]
+        owned.set_exception(e)
+        raise
+    owned.set_result(cover_path)
+    return cover_path
+
+def _write_bytes(path: str, data: bytes):
+    """Write data with raw os.write calls - no buffered file object in between"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
 def _default_metadata(file_path: str) -> dict:
     """Enhanced fallback metadata with filename parsing"""
     try:
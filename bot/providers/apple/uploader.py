@@ -1,29 +1,93 @@
 import os
-import shutil
-import zipfile
 import asyncio
-import re
 from config import Config
-from mutagen import File
-from mutagen.mp4 import MP4
-from bot.helpers.utils import format_string, send_message, edit_message
-from .utils import create_apple_zip
+from bot.helpers.utils import send_message, remove_file, remove_folder
+from bot.helpers.rclone_rc import public_link
+from bot.helpers.message import upload_admission
+from bot.helpers.database.pg_impl import file_cache
+from .utils import create_apple_zip, AppleZipStream, content_digest
 from bot.logger import LOGGER
 from bot.settings import bot_set
 
+# Caption templates bound to str.format_map once - formatting is plain CPU work, no await needed.
+# Filled straight from the item metadata, normalised by AppleMusicCore._process_content
+TRACK_CAPTION = "🎵 **{title}**\n👤 {artist}\n🎧 {provider}".format_map
+VIDEO_CAPTION = "🎬 **{title}**\n👤 {artist}\n🎧 {provider} Video".format_map
+ALBUM_CAPTION = "💿 **{title}**\n👤 {artist}\n🎧 {provider}".format_map
+ARTIST_CAPTION = "🎤 **{title}**\n🎧 {provider} Discography".format_map
+PLAYLIST_CAPTION = "🎵 **{title}**\n👤 Curated by {artist}\n🎧 {provider} Playlist".format_map
+LINK_LINE = "\n🔗 [Direct Link]({})".format
+
+# send_message type -> Message attribute holding the uploaded media
+MEDIA_ATTR = {'audio': 'audio', 'video': 'video', 'doc': 'document'}
+
+async def _gather_uploads(upload_func, items, user):
+    """Run upload_func for every item concurrently, logging failures without cancelling siblings"""
+    async def _one(item):
+        async with upload_admission:
+            return await upload_func(item, user)
+
+    results = await asyncio.gather(*(_one(item) for item in items), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            LOGGER.error(f"Apple upload failed: {str(result)}")
+
+async def _send_cached(user, item, itype, caption=None, meta=None, digest=None):
+    """
+    send_message for media, re-sending by Telegram file_id when identical content was uploaded before
+    Returns:
+        Message or None
+    """
+    # digest and the psycopg2 round trips are blocking - keep them off the event loop
+    loop = asyncio.get_running_loop()
+    if digest is None:
+        digest = await loop.run_in_executor(None, content_digest, item, itype)
+    file_id = await loop.run_in_executor(None, file_cache.get_file_id, digest)
+    if file_id:
+        msg = await send_message(user, file_id, itype, caption=caption, meta=meta)
+        if msg:
+            return msg
+        # file_id no longer usable - upload again
+        await loop.run_in_executor(None, file_cache.remove_file_id, digest)
+
+    msg = await send_message(user, item, itype, caption=caption, meta=meta)
+    media = getattr(msg, MEDIA_ATTR[itype], None) if msg else None
+    if media:
+        await loop.run_in_executor(None, file_cache.set_file_id, digest, itype, media.file_id)
+    return msg
+
+def _open_zip_stream(folder_path, name):
+    """AppleZipStream for folder_path and its file_id cache digest (blocking)"""
+    zip_stream = AppleZipStream(folder_path, name)
+    return zip_stream, content_digest(zip_stream, 'doc')
+
+async def _send_apple_zip(metadata, user, caption):
+    """Stream the folder as a zip straight into Telegram, falling back to a zip on disk"""
+    # building the stream walks and stats the whole folder - do it with the digest in one executor call
+    zip_stream, digest = await asyncio.get_running_loop().run_in_executor(
+        None,
+        _open_zip_stream,
+        metadata['folderpath'],
+        f"{metadata['title']} - {metadata['artist']}.zip"
+    )
+    if await _send_cached(user, zip_stream, 'doc', caption=caption, digest=digest):
+        return
+
+    LOGGER.info("Apple zip stream upload failed, retrying with zip on disk")
+    zip_path = await create_apple_zip(metadata['folderpath'], user['user_id'], metadata)
+    await _send_cached(user, zip_path, 'doc', caption=caption, digest=digest)
+    await remove_file(zip_path)
+
 async def apple_track_upload(metadata, user):
     """Apple Music-specific track upload"""
-    base_path = os.path.join(Config.LOCAL_STORAGE, "Apple Music")
+    base_path = user['base_path']
     
     if Config.UPLOAD_MODE == 'Telegram':
-        await send_message(
+        await _send_cached(
             user,
             metadata['filepath'],
             'audio',
-            caption=await format_string(
-                "🎵 **{title}**\n👤 {artist}\n🎧 Apple Music",
-                {'title': metadata['title'], 'artist': metadata['artist']}
-            ),
+            caption=TRACK_CAPTION(metadata),
             meta={
                 'duration': metadata['duration'],
                 'artist': metadata['artist'],
@@ -33,167 +97,120 @@ async def apple_track_upload(metadata, user):
         )
     elif Config.UPLOAD_MODE == 'Rclone':
         rclone_link, index_link = await apple_rclone_upload(user, metadata['filepath'], base_path)
-        text = await format_string(
-            "🎵 **{title}**\n👤 {artist}\n🎧 Apple Music\n🔗 [Direct Link]({r_link})",
-            {'title': metadata['title'], 'artist': metadata['artist'], 'r_link': rclone_link}
-        )
+        text = TRACK_CAPTION(metadata) + LINK_LINE(rclone_link)
         if index_link:
             text += f"\n📁 [Index Link]({index_link})"
         await send_message(user, text)
     
-    os.remove(metadata['filepath'])
-    if metadata.get('thumbnail'):
-        os.remove(metadata['thumbnail'])
+    await remove_file(metadata['filepath'])
+    # thumbnail may be shared with other tracks of this task - removed with the task folder
 
 async def apple_music_video_upload(metadata, user):
     """Apple Music-specific video upload"""
-    base_path = os.path.join(Config.LOCAL_STORAGE, "Apple Music")
+    base_path = user['base_path']
     
     if Config.UPLOAD_MODE == 'Telegram':
-        await send_message(
+        await _send_cached(
             user,
             metadata['filepath'],
             'video',
-            caption=await format_string(
-                "🎬 **{title}**\n👤 {artist}\n🎧 Apple Music Video",
-                {'title': metadata['title'], 'artist': metadata['artist']}
-            ),
+            caption=VIDEO_CAPTION(metadata),
             meta=metadata
         )
     elif Config.UPLOAD_MODE == 'Rclone':
         rclone_link, index_link = await apple_rclone_upload(user, metadata['filepath'], base_path)
-        text = await format_string(
-            "🎬 **{title}**\n👤 {artist}\n🎧 Apple Music Video\n🔗 [Direct Link]({r_link})",
-            {'title': metadata['title'], 'artist': metadata['artist'], 'r_link': rclone_link}
-        )
+        text = VIDEO_CAPTION(metadata) + LINK_LINE(rclone_link)
         if index_link:
             text += f"\n📁 [Index Link]({index_link})"
         await send_message(user, text)
     
-    os.remove(metadata['filepath'])
-    if metadata.get('thumbnail'):
-        os.remove(metadata['thumbnail'])
+    await remove_file(metadata['filepath'])
+    # thumbnail may be shared with other tracks of this task - removed with the task folder
 
 async def apple_album_upload(metadata, user):
     """Apple Music-specific album upload"""
-    base_path = os.path.join(Config.LOCAL_STORAGE, "Apple Music")
+    base_path = user['base_path']
     
     if Config.UPLOAD_MODE == 'Telegram':
         if Config.ALBUM_ZIP:
-            zip_path = await create_apple_zip(metadata['folderpath'], user['user_id'], metadata)
-            await send_message(
+            await _send_apple_zip(
+                metadata,
                 user,
-                zip_path,
-                'doc',
-                caption=await format_string(
-                    "💿 **{album}**\n👤 {artist}\n🎧 Apple Music",
-                    {'album': metadata['title'], 'artist': metadata['artist']}
-                )
+                ALBUM_CAPTION(metadata)
             )
-            os.remove(zip_path)
         else:
-            for track in metadata['tracks']:
-                await apple_track_upload(track, user)
+            await _gather_uploads(apple_track_upload, metadata['tracks'], user)
     elif Config.UPLOAD_MODE == 'Rclone':
         rclone_link, index_link = await apple_rclone_upload(user, metadata['folderpath'], base_path)
-        text = await format_string(
-            "💿 **{album}**\n👤 {artist}\n🎧 Apple Music\n🔗 [Direct Link]({r_link})",
-            {'album': metadata['title'], 'artist': metadata['artist'], 'r_link': rclone_link}
-        )
+        text = ALBUM_CAPTION(metadata) + LINK_LINE(rclone_link)
         if index_link:
             text += f"\n📁 [Index Link]({index_link})"
         await send_message(user, text)
     
-    shutil.rmtree(metadata['folderpath'])
+    await remove_folder(metadata['folderpath'])
 
 async def apple_artist_upload(metadata, user):
     """Apple Music-specific artist upload"""
-    base_path = os.path.join(Config.LOCAL_STORAGE, "Apple Music")
+    base_path = user['base_path']
     
     if Config.UPLOAD_MODE == 'Telegram':
         if Config.ARTIST_ZIP:
-            zip_path = await create_apple_zip(metadata['folderpath'], user['user_id'], metadata)
-            await send_message(
+            await _send_apple_zip(
+                metadata,
                 user,
-                zip_path,
-                'doc',
-                caption=await format_string(
-                    "🎤 **{artist}**\n🎧 Apple Music Discography",
-                    {'artist': metadata['title']}
-                )
+                ARTIST_CAPTION(metadata)
             )
-            os.remove(zip_path)
         else:
-            for album in metadata['albums']:
-                await apple_album_upload(album, user)
+            # One fan-out over every album's tracks - the whole discography
+            # shares the upload admission instead of nesting per album
+            tracks = [track for album in metadata['albums'] for track in album['tracks']]
+            await _gather_uploads(apple_track_upload, tracks, user)
     elif Config.UPLOAD_MODE == 'Rclone':
         rclone_link, index_link = await apple_rclone_upload(user, metadata['folderpath'], base_path)
-        text = await format_string(
-            "🎤 **{artist}**\n🎧 Apple Music Discography\n🔗 [Direct Link]({r_link})",
-            {'artist': metadata['title'], 'r_link': rclone_link}
-        )
+        text = ARTIST_CAPTION(metadata) + LINK_LINE(rclone_link)
         if index_link:
             text += f"\n📁 [Index Link]({index_link})"
         await send_message(user, text)
     
-    shutil.rmtree(metadata['folderpath'])
+    await remove_folder(metadata['folderpath'])
 
 async def apple_playlist_upload(metadata, user):
     """Apple Music-specific playlist upload"""
-    base_path = os.path.join(Config.LOCAL_STORAGE, "Apple Music")
+    base_path = user['base_path']
     
     if Config.UPLOAD_MODE == 'Telegram':
         if Config.PLAYLIST_ZIP:
-            zip_path = await create_apple_zip(metadata['folderpath'], user['user_id'], metadata)
-            await send_message(
+            await _send_apple_zip(
+                metadata,
                 user,
-                zip_path,
-                'doc',
-                caption=await format_string(
-                    "🎵 **{title}**\n👤 Curated by {artist}\n🎧 Apple Music Playlist",
-                    {'title': metadata['title'], 'artist': metadata.get('artist', 'Various Artists')}
-                )
+                PLAYLIST_CAPTION(metadata)
             )
-            os.remove(zip_path)
         else:
-            for track in metadata['tracks']:
-                await apple_track_upload(track, user)
+            await _gather_uploads(apple_track_upload, metadata['tracks'], user)
     elif Config.UPLOAD_MODE == 'Rclone':
         rclone_link, index_link = await apple_rclone_upload(user, metadata['folderpath'], base_path)
-        text = await format_string(
-            "🎵 **{title}**\n👤 Curated by {artist}\n🎧 Apple Music Playlist\n🔗 [Direct Link]({r_link})",
-            {'title': metadata['title'], 'artist': metadata.get('artist', 'Various Artists'), 'r_link': rclone_link}
-        )
+        text = PLAYLIST_CAPTION(metadata) + LINK_LINE(rclone_link)
         if index_link:
             text += f"\n📁 [Index Link]({index_link})"
         await send_message(user, text)
     
-    shutil.rmtree(metadata['folderpath'])
+    await remove_folder(metadata['folderpath'])
 
 async def apple_rclone_upload(user, path, base_path):
     """Apple Music-specific Rclone upload"""
     if not Config.RCLONE_DEST:
         return None, None
     
-    relative_path = str(path).replace(base_path, "").lstrip('/')
+    # relpath, not str.replace - base_path must only be stripped from the front
+    relative_path = os.path.relpath(path, base_path).replace(os.sep, '/')
     
     rclone_link = None
     index_link = None
 
     if bot_set.link_options in ['RCLONE', 'Both']:
-        cmd = f'rclone link --config ./rclone.conf "{Config.RCLONE_DEST}/{relative_path}"'
-        task = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-
-        stdout, stderr = await task.communicate()
-
-        if task.returncode == 0:
-            rclone_link = stdout.decode().strip()
-        else:
-            LOGGER.error(f"Apple Rclone Error: {stderr.decode().strip()}")
+        rclone_link = await public_link(relative_path)
+        if not rclone_link:
+            LOGGER.error(f"Apple Rclone Error: no link for {relative_path}")
     
     if bot_set.link_options in ['Index', 'Both'] and Config.INDEX_LINK:
         index_link = f"{Config.INDEX_LINK}/{relative_path}"
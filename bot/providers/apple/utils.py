@@ -1,15 +1,33 @@
+import io
+import hashlib
 import os
 import re
+import asyncio
 import shutil
+import tempfile
 import zipfile
 import logging
-import subprocess
-from pathlib import Path
+from functools import lru_cache
+from types import MappingProxyType
 from config import Config
 from bot.logger import LOGGER
 
 logger = logging.getLogger(__name__)
 
+# Root of the per-user Apple download folders
+APPLE_BASE_DIR = os.path.join(Config.LOCAL_STORAGE, "Apple Music")
+APPLE_ZIP_DIR = os.path.join(Config.LOCAL_STORAGE, "Zips")
+
+@lru_cache(maxsize=512)
+def apple_user_dir(user_id: int) -> str:
+    """Per-user Apple download folder - LOCAL_STORAGE is fixed, so the path is built once per user"""
+    return os.path.join(APPLE_BASE_DIR, str(user_id))
+
+# Compiled once at import. Storefront is a single path segment - no `.+` to backtrack over
+APPLE_URL_RE = re.compile(r"https://music\.apple\.com/[^/]+/(?:album|song|playlist|music-video|artist)/.")
+CONTENT_ID_RE = re.compile(r"/(album|song|playlist|music-video|artist)/[^/]+/(\d+)")
+
+@lru_cache(maxsize=1024)
 def validate_apple_url(url: str) -> bool:
     """
     Validate Apple Music URL format
@@ -18,13 +36,9 @@ def validate_apple_url(url: str) -> bool:
     Returns:
         bool: True if valid Apple Music content URL
     """
-    patterns = [
-        r"https://music\.apple\.com/.+/(album|song|playlist|music-video|artist)/.+",
-        r"https://music\.apple\.com/.+/album/.+",
-        r"https://music\.apple\.com/.+/playlist/.+"
-    ]
-    return any(re.match(pattern, url) for pattern in patterns)
+    return APPLE_URL_RE.match(url) is not None
 
+@lru_cache(maxsize=1024)
 def extract_content_id(url: str) -> str:
     """
     Extract Apple Music content ID from URL
@@ -33,7 +47,7 @@ def extract_content_id(url: str) -> str:
     Returns:
         str: Content ID or 'unknown' if not found
     """
-    match = re.search(r'/(album|song|playlist|music-video|artist)/[^/]+/(\d+)', url)
+    match = CONTENT_ID_RE.search(url)
     return match.group(2) if match else "unknown"
 
 def create_apple_directory(user_id: int) -> str:
@@ -45,23 +59,28 @@ def create_apple_directory(user_id: int) -> str:
         str: Path to created directory
     """
     try:
-        base_dir = os.path.join(
-            Config.LOCAL_STORAGE,
-            "Apple Music",
-            str(user_id)
-        )
-        Path(base_dir).mkdir(parents=True, exist_ok=True)
-        
-        # Create subdirectories using pathlib
-        (Path(base_dir)/"alac").mkdir(exist_ok=True)
-        (Path(base_dir)/"atmos").mkdir(exist_ok=True)
-        (Path(base_dir)/"aac").mkdir(exist_ok=True)
+        base_dir = apple_user_dir(user_id)
+        # Parents only need walking once - the format folders are a single mkdir each
+        os.makedirs(base_dir, exist_ok=True)
+        for folder in ("alac", "atmos", "aac"):
+            try:
+                os.mkdir(os.path.join(base_dir, folder))
+            except FileExistsError:
+                pass
         
-        # Generate config
-        config_path = Path(base_dir)/"config.yaml"
-        if not config_path.exists():
-            with open(config_path, 'w') as f:
-                f.write(generate_apple_config(user_id))
+        # Generate config - kept if already there, written to a temp file and
+        # renamed so an interrupted write never leaves a truncated config behind
+        config_path = os.path.join(base_dir, "config.yaml")
+        if not os.path.exists(config_path):
+            # unique temp name - concurrent tasks of one user run this in different executor threads
+            fd, tmp_path = tempfile.mkstemp(dir=base_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(generate_apple_config(user_id))
+                os.replace(tmp_path, config_path)
+            except BaseException:
+                _discard(tmp_path)
+                raise
         
         LOGGER.debug(f"Created Apple directory: {base_dir}")
         return base_dir
@@ -69,38 +88,31 @@ def create_apple_directory(user_id: int) -> str:
         logger.error(f"Directory creation failed: {str(e)}")
         raise
 
-def generate_apple_config(user_id: int) -> str:
-    """Generate complete Apple Music config with user-specific paths"""
-    base_dir = os.path.join(
-        Config.LOCAL_STORAGE,
-        "Apple Music",
-        str(user_id)
-    )
-    
-    return f"""media-user-token: "{Config.APPLE_MEDIA_TOKEN}"
-authorization-token: "{Config.APPLE_AUTH_TOKEN}"
+# Downloader config.yaml, filled per user by generate_apple_config
+APPLE_CONFIG_TEMPLATE = """media-user-token: "{media_token}"
+authorization-token: "{auth_token}"
 language: "en-US"
 lrc-type: "lyrics"
 lrc-format: "lrc"
 embed-lrc: true
 save-lrc-file: true
-save-artist-cover: true
+save-artist-cover: {artist_cover}
 save-animated-artwork: false
 emby-animated-artwork: false
 embed-cover: true
-cover-size: 5000x5000
-cover-format: jpg
-alac-save-folder: {os.path.join(base_dir, "alac")}
-atmos-save-folder: {os.path.join(base_dir, "atmos")}
-aac-save-folder: {os.path.join(base_dir, "aac")}
+cover-size: {cover_size}
+cover-format: {cover_format}
+alac-save-folder: {alac_dir}
+atmos-save-folder: {atmos_dir}
+aac-save-folder: {aac_dir}
 max-memory-limit: 256
 decrypt-m3u8-port: "127.0.0.1:10020"
 get-m3u8-port: "127.0.0.1:20020"
 get-m3u8-from-device: true
 get-m3u8-mode: hires
 aac-type: aac-lc
-alac-max: {Config.APPLE_ALAC_QUALITY}
-atmos-max: {Config.APPLE_ATMOS_QUALITY}
+alac-max: {alac_max}
+atmos-max: {atmos_max}
 limit-max: 200
 album-folder-format: "{{AlbumName}}"
 playlist-folder-format: "{{PlaylistName}}"
@@ -113,9 +125,30 @@ use-songinfo-for-playlist: false
 dl-albumcover-for-playlist: false
 mv-audio-type: atmos
 mv-max: 2160
-storefront: "{Config.APPLE_STOREFRONT}"
+storefront: "{storefront}"
 """
 
+def generate_apple_config(user_id: int) -> str:
+    """
+    Generate complete Apple Music config with user-specific paths
+    Not cached - quality settings are changed at runtime from provider settings
+    """
+    base_dir = apple_user_dir(user_id)
+    
+    return APPLE_CONFIG_TEMPLATE.format_map({
+        'media_token': Config.APPLE_MEDIA_TOKEN,
+        'auth_token': Config.APPLE_AUTH_TOKEN,
+        'alac_dir': os.path.join(base_dir, "alac"),
+        'atmos_dir': os.path.join(base_dir, "atmos"),
+        'aac_dir': os.path.join(base_dir, "aac"),
+        'alac_max': Config.APPLE_ALAC_QUALITY,
+        'atmos_max': Config.APPLE_ATMOS_QUALITY,
+        'storefront': Config.APPLE_STOREFRONT,
+        'cover_size': Config.APPLE_COVER_SIZE,
+        'cover_format': Config.APPLE_COVER_FORMAT,
+        'artist_cover': 'true' if Config.APPLE_ARTIST_COVER == 'True' else 'false'
+    })
+
 def cleanup_apple_files(user_id: int):
     """
     Cleanup Apple Music temporary files
@@ -123,14 +156,10 @@ def cleanup_apple_files(user_id: int):
         user_id: Telegram user ID
     """
     try:
-        apple_dir = os.path.join(
-            Config.LOCAL_STORAGE,
-            "Apple Music",
-            str(user_id)
-        )
-        if os.path.exists(apple_dir):
-            shutil.rmtree(apple_dir, ignore_errors=True)
-            LOGGER.debug(f"Cleaned Apple directory: {apple_dir}")
+        apple_dir = apple_user_dir(user_id)
+        # ignore_errors already covers a missing folder - no exists() check first
+        shutil.rmtree(apple_dir, ignore_errors=True)
+        LOGGER.debug(f"Cleaned Apple directory: {apple_dir}")
     except Exception as e:
         logger.error(f"Apple cleanup failed: {str(e)}")
 
@@ -140,25 +169,29 @@ def verify_apple_dependencies():
     Raises:
         RuntimeError: If any dependency is missing
     """
-    required_tools = {
-        'rclone': 'rclone version',
-        'N_m3u8DL-RE': 'N_m3u8DL-RE --version',
-        'MP4Box': 'MP4Box -version'
-    }
-    
-    missing = []
-    for tool, test_cmd in required_tools.items():
-        try:
-            subprocess.run(test_cmd.split(), 
-                         stdout=subprocess.DEVNULL,
-                         stderr=subprocess.DEVNULL,
-                         check=True)
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            missing.append(tool)
+    # PATH lookups only - no need to start each tool to know it is installed
+    missing = [
+        tool for tool in ('rclone', 'N_m3u8DL-RE', 'MP4Box')
+        if shutil.which(tool) is None
+    ]
     
     if missing:
         raise RuntimeError(f"Missing required tools: {', '.join(missing)}")
 
+# Display names per format, keyed by the configured quality value
+APPLE_QUALITY_NAMES = {
+    'alac': {
+        192000: 'ALAC 16-bit/44.1kHz',
+        256000: 'ALAC 24-bit/48kHz',
+        320000: 'ALAC 24-bit/96kHz'
+    },
+    'atmos': {
+        2768: 'Dolby Atmos 768kbps',
+        3072: 'Dolby Atmos 1536kbps',
+        3456: 'Dolby Atmos 3456kbps'
+    }
+}
+
 def format_apple_quality(format_type: str) -> str:
     """
     Format quality information for user display
@@ -167,33 +200,27 @@ def format_apple_quality(format_type: str) -> str:
     Returns:
         str: Human-readable quality info
     """
-    qualities = {
-        'alac': {
-            192000: 'ALAC 16-bit/44.1kHz',
-            256000: 'ALAC 24-bit/48kHz',
-            320000: 'ALAC 24-bit/96kHz'
-        },
-        'atmos': {
-            2768: 'Dolby Atmos 768kbps',
-            3072: 'Dolby Atmos 1536kbps',
-            3456: 'Dolby Atmos 3456kbps'
-        }
-    }
-    quality = getattr(Config, f'APPLE_{format_type.upper()}_QUALITY')
-    return qualities[format_type].get(quality, 'Unknown Quality')
+    quality = Config.APPLE_ALAC_QUALITY if format_type == 'alac' else Config.APPLE_ATMOS_QUALITY
+    return APPLE_QUALITY_NAMES[format_type].get(quality, 'Unknown Quality')
+
+# Read-only and shared - settings menus get the same object on every render
+APPLE_SUPPORTED_FORMATS = MappingProxyType({
+    'alac': ('192000', '256000', '320000'),
+    'atmos': ('2768', '3072', '3456')
+})
 
-def apple_supported_formats() -> dict:
+def apple_supported_formats() -> MappingProxyType:
     """
     Get supported formats and qualities
     Returns:
-        dict: Format information for settings
+        MappingProxyType: Format information for settings (read-only)
     """
-    return {
-        'alac': ['192000', '256000', '320000'],
-        'atmos': ['2768', '3072', '3456']
-    }
+    return APPLE_SUPPORTED_FORMATS
+
+# Copy buffer for zipping - media is already compressed so the archive is a plain copy
+ZIP_BUFFER_SIZE = 1024 * 1024
 
-def create_apple_zip(folder_path: str, user_id: int, metadata: dict) -> str:
+async def create_apple_zip(folder_path: str, user_id: int, metadata: dict) -> str:
     """
     Create zip file for Apple Music content
     Args:
@@ -205,20 +232,251 @@ def create_apple_zip(folder_path: str, user_id: int, metadata: dict) -> str:
     """
     try:
         zip_name = f"{metadata['title']} - {metadata['artist']}.zip"
-        zip_dir = os.path.join(Config.LOCAL_STORAGE, "Zips", str(user_id))
+        # Zipping is blocking disk I/O, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        expected_size = await loop.run_in_executor(None, _folder_size, folder_path)
+
+        disk_dir = os.path.join(APPLE_ZIP_DIR, str(user_id))
+        zip_dir = _ramdisk_zip_dir(user_id, expected_size) or disk_dir
         zip_path = os.path.join(zip_dir, zip_name)
-        
         os.makedirs(zip_dir, exist_ok=True)
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, folder_path)
-                    zipf.write(file_path, arcname)
+
+        try:
+            await loop.run_in_executor(None, _write_apple_zip, folder_path, zip_path)
+        except OSError:
+            if zip_dir == disk_dir:
+                raise
+            # ramdisk filled up meanwhile (other zips running) - redo it on disk
+            LOGGER.info("Apple zip did not fit in ramdisk, writing to disk")
+            await loop.run_in_executor(None, _discard, zip_path)
+            zip_path = os.path.join(disk_dir, zip_name)
+            os.makedirs(disk_dir, exist_ok=True)
+            await loop.run_in_executor(None, _write_apple_zip, folder_path, zip_path)
         
         LOGGER.info(f"Created Apple zip archive: {zip_path}")
         return zip_path
     except Exception as e:
         logger.error(f"Zip creation failed: {str(e)}")
         raise
+
+def _folder_size(folder_path: str) -> int:
+    """Total size of files under folder_path (a stored zip is barely larger)"""
+    return sum(entry.stat().st_size for entry in _iter_files(folder_path))
+
+def _iter_files(path: str):
+    """
+    Files under path as os.DirEntry, recursing with os.scandir
+    is_dir() reads the type from the directory listing, no stat per entry
+    """
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            else:
+                yield entry
+
+def _ramdisk_zip_dir(user_id: int, expected_size: int):
+    """
+    Zip folder on Config.ZIP_RAMDISK if the archive fits with 10% headroom,
+    so it is not written to disk only to be read back and deleted right after
+    Returns:
+        str or None: None when the ramdisk is missing or too small
+    """
+    ramdisk = Config.ZIP_RAMDISK
+    if not ramdisk or not os.path.isdir(ramdisk):
+        return None
+    try:
+        if shutil.disk_usage(ramdisk).free > expected_size * 1.1:
+            return os.path.join(ramdisk, "Zips", str(user_id))
+    except OSError:
+        pass
+    return None
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _copy_into(src, dst, view: memoryview):
+    """Copy src to dst reusing one preallocated buffer instead of a new bytes object per chunk"""
+    while n := src.readinto(view):
+        dst.write(view[:n])
+
+def _write_apple_zip(folder_path: str, zip_path: str):
+    """Write folder contents into an uncompressed (stored) ZIP64 archive"""
+    view = memoryview(bytearray(ZIP_BUFFER_SIZE))
+    with open(zip_path, 'wb', buffering=ZIP_BUFFER_SIZE) as out, \
+            zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zipf:
+        for file_path, zinfo in _zip_entries(folder_path):
+            with open(file_path, 'rb', buffering=0) as src, zipf.open(zinfo, 'w', force_zip64=True) as dst:
+                _copy_into(src, dst, view)
+
+def _zip_entries(folder_path: str) -> list:
+    """
+    Stored zip entries for every file under folder_path, biggest first (ties by name),
+    so the archive layout and content_digest don't depend on directory order
+    Returns:
+        list: (file_path, ZipInfo) pairs
+    """
+    entries = []
+    # scandir paths all start with folder_path, so the arcname is a plain slice
+    base_len = len(os.path.join(folder_path, ''))
+    for entry in _iter_files(folder_path):
+        zinfo = zipfile.ZipInfo.from_file(entry.path, entry.path[base_len:])
+        zinfo.compress_type = zipfile.ZIP_STORED
+        entries.append((entry.path, zinfo))
+    entries.sort(key=lambda entry: (-entry[1].file_size, entry[1].filename))
+    return entries
+
+class _ZipSink:
+    """Write-only sink collecting zipfile output; no tell() so zipfile streams with data descriptors"""
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+class AppleZipStream(io.RawIOBase):
+    """
+    Read-only stored zip of a folder, generated while it is read
+    Lets Telegram upload the archive without writing a temporary zip to disk.
+    Only seeking to the start or the end is supported - that's all pyrogram needs.
+    Args:
+        folder_path: Path to folder to zip
+        name: File name shown in Telegram
+    """
+    def __init__(self, folder_path: str, name: str):
+        super().__init__()
+        self.name = name
+        self.entries = _zip_entries(folder_path)
+        self.size = self._archive_size()
+        self._reset()
+
+    def _archive_size(self) -> int:
+        """Exact archive size for stored entries with ZIP64 local headers and data descriptors"""
+        offset = 0
+        central_size = 0
+        for _, zinfo in self.entries:
+            name_len = len(zinfo.filename.encode('utf-8'))
+            zip64_fields = 0
+            if zinfo.file_size > zipfile.ZIP64_LIMIT:
+                zip64_fields += 2
+            if offset > zipfile.ZIP64_LIMIT:
+                zip64_fields += 1
+            central_size += 46 + name_len + (4 + 8 * zip64_fields if zip64_fields else 0)
+            # local header + zip64 extra + data + zip64 data descriptor
+            offset += 30 + name_len + 20 + zinfo.file_size + 24
+        size = offset + central_size + 22
+        if (len(self.entries) > zipfile.ZIP_FILECOUNT_LIMIT
+                or offset > zipfile.ZIP64_LIMIT or central_size > zipfile.ZIP64_LIMIT):
+            size += 56 + 20
+        return size
+
+    def _generate(self):
+        view = memoryview(bytearray(ZIP_BUFFER_SIZE))
+        with zipfile.ZipFile(self._sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zipf:
+            for file_path, zinfo in self.entries:
+                with open(file_path, 'rb', buffering=0) as src, zipf.open(zinfo, 'w', force_zip64=True) as dst:
+                    while n := src.readinto(view):
+                        dst.write(view[:n])
+                        yield
+
+    def _reset(self):
+        if getattr(self, '_chunks', None):
+            self._chunks.close()
+        self._sink = _ZipSink()
+        self._chunks = self._generate()
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_END and offset == 0:
+            self._pos = self.size
+        elif whence == io.SEEK_SET and offset == 0:
+            self._reset()
+        elif not (whence == io.SEEK_SET and offset == self._pos):
+            raise io.UnsupportedOperation("AppleZipStream can only seek to start or end")
+        return self._pos
+
+    def readinto(self, b):
+        buffer = self._sink.buffer
+        while len(buffer) < len(b) and self._chunks is not None:
+            try:
+                next(self._chunks)
+            except StopIteration:
+                self._chunks = None
+        n = min(len(b), len(buffer))
+        b[:n] = buffer[:n]
+        del buffer[:n]
+        self._pos += n
+        if n == 0 and self._pos != self.size:
+            raise IOError(f"Zip stream size mismatch: expected {self.size}, produced {self._pos}")
+        return n
+
+    def close(self):
+        # pyrogram closes the file after every upload - stay reusable for FloodWait retries
+        self._reset()
+
+# User option -> downloader flag, in the order flags are passed
+APPLE_OPTION_FLAGS = (
+    ('aac', '--aac'),
+    ('aac-type', '--aac-type'),
+    ('alac-max', '--alac-max'),
+    ('all-album', '--all-album'),
+    ('atmos', '--atmos'),
+    ('atmos-max', '--atmos-max'),
+    ('debug', '--debug'),
+    ('mv-audio-type', '--mv-audio-type'),
+    ('mv-max', '--mv-max'),
+    ('select', '--select'),
+    ('song', '--song')
+)
+
+def build_apple_options(options: dict) -> list:
+    """Original option mapping preserved, flags always in APPLE_OPTION_FLAGS order"""
+    cmd = []
+    if not options:
+        return cmd
+    for key, flag in APPLE_OPTION_FLAGS:
+        if key in options:
+            value = options[key]
+            cmd.append(flag)
+            if not isinstance(value, bool):
+                cmd.append(str(value))
+    return cmd
+
+def content_digest(item, kind: str) -> str:
+    """
+    sha256 over what Telegram would receive, used as the file_id cache key
+    Args:
+        item: file path or AppleZipStream
+        kind: upload type ('audio', 'video', 'doc')
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256(kind.encode())
+    view = memoryview(bytearray(ZIP_BUFFER_SIZE))
+    if isinstance(item, AppleZipStream):
+        digest.update(item.name.encode('utf-8'))
+        files = [(path, zinfo.filename) for path, zinfo in item.entries]
+    else:
+        files = [(item, os.path.basename(item))]
+    for path, name in files:
+        digest.update(f"\0{name}\0{os.path.getsize(path)}\0".encode('utf-8'))
+        with open(path, 'rb', buffering=0) as f:
+            while n := f.readinto(view):
+                digest.update(view[:n])
+    return digest.hexdigest()
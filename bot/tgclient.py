@@ -2,6 +2,7 @@ from config import Config
 from pyrogram import Client
 from .logger import LOGGER
 from .settings import bot_set
+from .helpers.rclone_rc import start_rcd, stop_rcd
 import subprocess
 import os
 
@@ -26,6 +27,8 @@ class Bot(Client):
         await bot_set.login_qobuz()
         await bot_set.login_deezer()
         await bot_set.login_tidal()
+        if bot_set.rclone:
+            await start_rcd()
         
         # Initialize Apple Music downloader
         if not os.path.exists(Config.DOWNLOADER_PATH):
@@ -38,6 +41,7 @@ class Bot(Client):
         await super().stop()
         for client in bot_set.clients:
             await client.session.close()
+        await stop_rcd()
         LOGGER.info('BOT : Exited Successfully!')
 
 aio = Bot()
@@ -32,6 +32,7 @@ class Config:
                                                                             # Local storage path (path)
     # Base directory for downloads
     DOWNLOAD_BASE_DIR = LOCAL_STORAGE
+    ZIP_RAMDISK       = getenv("ZIP_RAMDISK", "/dev/shm")                  # RAM backed folder for temporary zips (path)
     
     # File/Folder Naming
     PLAYLIST_NAME_FORMAT = getenv("PLAYLIST_NAME_FORMAT", "{title} - Playlist")  
@@ -43,6 +44,7 @@ class Config:
     RCLONE_CONFIG     = getenv("RCLONE_CONFIG")                            # Path or URL to rclone.conf
     RCLONE_DEST       = getenv("RCLONE_DEST")                              # e.g. "remote:AppleMusic"
     INDEX_LINK        = getenv("INDEX_LINK")                               # Optional index base URL
+    RCLONE_RC_ADDR    = getenv("RCLONE_RC_ADDR", "127.0.0.1:5572")         # Address for the local `rclone rcd` daemon
 
     # Qobuz Configuration
     QOBUZ_EMAIL       = getenv("QOBUZ_EMAIL")                              # User email (string)
@@ -72,6 +74,8 @@ class Config:
 
     # Concurrent Workers
     MAX_WORKERS      = int(getenv("MAX_WORKERS", 5))                       # Number of threads (int)
+    CONCURRENT_UPLOADS = int(getenv("CONCURRENT_UPLOADS", 4))              # Telegram sends in flight at once, bot wide - shared by all tasks and users (int)
+    EDIT_MIN_INTERVAL  = float(getenv("EDIT_MIN_INTERVAL", 0.05))         # Seconds between any two message edits, bot wide (float)
 
     # Apple Music Configuration
     DOWNLOADER_PATH   = getenv("DOWNLOADER_PATH", "/usr/src/app/downloader/am_downloader.sh")  
@@ -84,6 +88,11 @@ class Config:
     APPLE_MEDIA_TOKEN     = getenv("APPLE_MEDIA_TOKEN", "")               # Apple Music media token
     APPLE_AUTH_TOKEN      = getenv("APPLE_AUTH_TOKEN", "")                # Apple Music auth token
     APPLE_STOREFRONT      = getenv("APPLE_STOREFRONT", "us")              # Storefront country code
+    APPLE_COVER_SIZE      = getenv("APPLE_COVER_SIZE", "1400x1400")       # Embedded cover size (Telegram thumbs are ~1280px)
+    APPLE_COVER_FORMAT    = getenv("APPLE_COVER_FORMAT", "jpg")           # jpg, png or original
+    APPLE_ARTIST_COVER    = getenv("APPLE_ARTIST_COVER", "False")         # True or False - also save the artist image
+    APPLE_MAX_CONCURRENT  = int(getenv("APPLE_MAX_CONCURRENT", 2))        # Downloader processes running at once (int)
+    APPLE_PROGRESS_MIN_INTERVAL = float(getenv("APPLE_PROGRESS_MIN_INTERVAL", 2.0))  # Seconds between progress edits (float)
     
     # Optional Settings (via /settings)
     BOT_PUBLIC            = getenv("BOT_PUBLIC", "False")                 # True or False